@@ -1,88 +1,200 @@
 ## Given the set of official LLVM git-svn repositories, and an llvm
 ## svn repository, generates a list of author email mappings.
+##
+## Requires Python 3; runs considerably faster under pypy3.
 
 import subprocess, re
-import ConfigParser
+import configparser
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from multiprocessing.dummy import Pool as ThreadPool
 
-rev_to_git_author = {}
+# Collisions are reported here, so they go to stderr rather than being
+# mixed into the author map written to stdout.
+log = logging.getLogger("extract-author-ids")
+
+git_svn_id_re = re.compile(br'^git-svn-id: [^@\n]*@(\d+) ', re.MULTILINE)
+
+# The git project and author of each svn revision, indexed by revision
+# number (None where no git repository has that revision).
+rev_project = []
+rev_author = []
+
+# Reading the logs takes minutes, so the parsed results are saved here,
+# keyed by the repository's head revision and CACHE_FORMAT.
+cache_dir = os.path.expanduser("~/.cache/extract-author-ids")
+
+# Increment this whenever the way the logs are parsed changes, so results
+# saved by an older version aren't reused.
+CACHE_FORMAT = 2
+
+def cached(key, compute):
+  """Returns compute(), reusing the result saved under 'key' by a previous
+  run if there is one."""
+  filename = os.path.join(cache_dir, "%s-v%d.pkl" % (key, CACHE_FORMAT))
+  if os.path.exists(filename):
+    with open(filename, 'rb') as f:
+      return pickle.load(f)
+
+  result = compute()
+  try:
+    os.makedirs(cache_dir)
+  except OSError:
+    if not os.path.isdir(cache_dir):
+      raise
+  with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as fout:
+    pickle.dump(result, fout, -1)
+  os.rename(fout.name, filename)
+  return result
+
+def read_git_log(path):
+  """Returns the list of (rev, author) for the svn commits in one git repo,
+  in log order."""
+  # Only ask git for commits which came from svn, and only for their
+  # author and raw message, as NUL-separated fields. (Not just the body:
+  # for an empty svn log message, the git-svn-id: line is the subject.)
+  git_log = subprocess.check_output(["git", "-C", path, "log", "-z",
+                                     "--grep=^git-svn-id: ",
+                                     "--pretty=format:%an <%ae>%x00%B"])
+  fields = git_log.split(b'\x00')
+  revs = []
+  # There are only a few thousand distinct authors, so share one string
+  # object for each instead of keeping one per commit. This also means
+  # only decoding each distinct author once; the rest of the log is
+  # handled as bytes.
+  author_pool = {}
+  for raw_author, msg in zip(fields[0::2], fields[1::2]):
+    author = author_pool.get(raw_author)
+    if author is None:
+      author = author_pool[raw_author] = raw_author.decode('utf-8')
+    # git-svn appends the real git-svn-id: line last; earlier ones may be
+    # quoted from other commits (e.g. in reverts).
+    rev = git_svn_id_re.findall(msg)[-1]
+    revs.append((int(rev), author))
+  return revs
+
+def scan_git_repo(p):
+  path = "/d2/llvm-gits/%s" % p
+  head = subprocess.check_output(["git", "-C", path, "rev-parse", "HEAD"],
+                                 universal_newlines=True).strip()
+  return cached("git-%s-%s" % (p, head), lambda: read_git_log(path))
 
 def do_git():
-#  for p in ["clang", "clang-tools-extra", "compiler-rt", "dragonegg", "libcxxabi", "libcxx", "lldb", "lld", "llgo", "llvm", "lnt", "polly", "test-suite"]:
-  for p in ["clang", "clang-tools-extra", "compiler-rt", "dragonegg", "libcxxabi", "libcxx", "lldb", "lld", "llgo", "llvm", "lnt", "polly", "openmp"]:
-#  for p in ["clang", "llvm"]:
-    git_log = subprocess.check_output(["git", "-C", "/d2/llvm-gits/%s" % p, "log"]).split('\n')
-    author = None
-    for l in git_log:
-      if l.startswith("Author: "):
-        author=l[len("Author: "):]
-      elif l.startswith("    git-svn-id: "):
-        assert author is not None
-        rev = int(l.split("@")[1].split(' ')[0])
-
-        old_author = rev_to_git_author.get(rev)
-        if old_author and old_author[1] != author:
-          print "Collision: %s vs %s at %s %s" % (old_author, author, p, rev)
-        rev_to_git_author[rev] = (p, author)
-        author = None
-
-svn_authors = {}
-def do_svn():
-  svn_log = subprocess.check_output(["svn", "log", "file:///d2/llvm-svn"]).split("\n")
-#  svn_log = open("/d2/llvm-svn-log").read().split("\n")
-  i = 0
-  while True:
-    assert svn_log[i] == "------------------------------------------------------------------------"
-    i = i + 1
-    if i == len(svn_log) - 1:
-      break
-    l = svn_log[i]
-    match = re.match('^r([0-9]*) \| (.*) \| .* \| ([0-9]*) lines?', l)
-    if not match:
-      print i, len(svn_log)
-      print l
-      assert match
-    rev = int(match.group(1))
-    author = match.group(2).lower()
-    numlines = int(match.group(3))
-
-    svn_authors[rev] = author
-    i = i + numlines + 2
+#  repos = ["clang", "clang-tools-extra", "compiler-rt", "dragonegg", "libcxxabi", "libcxx", "lldb", "lld", "llgo", "llvm", "lnt", "polly", "test-suite"]
+  repos = ["clang", "clang-tools-extra", "compiler-rt", "dragonegg", "libcxxabi", "libcxx", "lldb", "lld", "llgo", "llvm", "lnt", "polly", "openmp"]
+#  repos = ["clang", "llvm"]
+
+  # The repos are scanned concurrently, but merged here in the original
+  # order, so collisions are reported the same way as a serial scan.
+  pool = ThreadPool(len(repos))
+  results = pool.map(scan_git_repo, repos)
+  pool.close()
+
+  max_rev = 0
+  for revs in results:
+    for rev, author in revs:
+      max_rev = max(max_rev, rev)
+  rev_project.extend([None] * (max_rev + 1))
+  rev_author.extend([None] * (max_rev + 1))
+
+  for p, revs in zip(repos, results):
+    for rev, author in revs:
+      old_author = rev_author[rev]
+      if old_author and old_author != author:
+        log.warning("Collision: %s vs %s at %s %s",
+                    (rev_project[rev], old_author), author, p, rev)
+      rev_project[rev] = p
+      rev_author[rev] = author
+
+def read_svn_log(youngest):
+  """Returns a list of the author of every svn revision up to 'youngest',
+  indexed by revision number."""
+  # --quiet omits the log messages, which we don't need; the XML form
+  # can then be parsed incrementally as svn produces it.
+  proc = subprocess.Popen(["svn", "log", "--xml", "--quiet",
+                           "-r", "1:%d" % youngest, "file:///d2/llvm-svn"],
+                          stdout=subprocess.PIPE)
+  authors = [None] * (youngest + 1)
+  author_pool = {}
+  for event, elem in ElementTree.iterparse(proc.stdout):
+    if elem.tag != 'logentry':
+      continue
+    rev = int(elem.get('revision'))
+    author = elem.findtext('author')
+    if author is None:
+      author = '(no author)'
+    author = author.lower()
+    authors[rev] = author_pool.setdefault(author, author)
+    elem.clear()
+  proc.wait()
+  if proc.returncode != 0:
+    raise Exception('svn log exited with non-zero exit code:',
+                    proc.returncode)
+  return authors
 
 svn_to_git = {}
-def gather_authors():
-  for rev,author in sorted(svn_authors.iteritems()):
-    git_author = rev_to_git_author.get(rev)
-    if git_author:
-      old_git_author = svn_to_git.get(author)
-      if old_git_author and old_git_author[2] and git_author[1] != old_git_author[2]:
-        print "SVN-Name-collision: %s : %s %s vs %s" % (author, rev, git_author, old_git_author)
-        svn_to_git["%s@%s" % (author,old_git_author[0])] = old_git_author
-      svn_to_git[author] = (rev, git_author[0], git_author[1])
-    else:
-      if not svn_to_git.get(author):
+
+def rename_old_git_author(author, where, git_author, old_git_author):
+  """Moves the existing mapping for 'author' aside to "author@rev", as it is
+  about to be replaced by a different git author."""
+  log.warning("SVN-Name-collision: %s : %s %s vs %s", author, where, git_author, old_git_author)
+  svn_to_git["%s@%s" % (author,old_git_author[0])] = old_git_author
+
+def do_svn():
+  """Matches each svn revision's author to the git author of that revision,
+  filling in svn_to_git. do_git must have been run first."""
+  youngest = int(subprocess.check_output(
+      ["svn", "info", "--show-item", "revision", "file:///d2/llvm-svn"]))
+  authors = cached("svn-%d" % youngest, lambda: read_svn_log(youngest))
+  for rev, author in enumerate(authors):
+    if author is None:
+      continue
+    git_author = rev < len(rev_author) and rev_author[rev]
+    if not git_author:
+      if author not in svn_to_git:
         svn_to_git[author] = (rev, None, None)
+      continue
+
+    p = rev_project[rev]
+    old_git_author = svn_to_git.get(author)
+    if old_git_author and old_git_author[2] and git_author != old_git_author[2]:
+      rename_old_git_author(author, rev, (p, git_author), old_git_author)
+    svn_to_git[author] = (rev, p, git_author)
+
+svn_mailer_authors = None
+def get_svn_mailer_authors():
+  """Returns the author map from svn-mailer.conf as a dict, only reading the
+  file the first time."""
+  global svn_mailer_authors
+  if svn_mailer_authors is None:
+    cfg = configparser.RawConfigParser(strict=False)
+    cfg.read("svn-mailer.conf")
+    svn_mailer_authors = dict(cfg.items('authors'))
+  return svn_mailer_authors
 
 def gather_from_authormap():
-  cfg = ConfigParser.RawConfigParser()
-  cfg.read("svn-mailer.conf")
-  for author,git_author in cfg.items('authors'):
+  for author,git_author in get_svn_mailer_authors().items():
     old_git_author = svn_to_git.get(author)
     if not old_git_author or not old_git_author[2] or old_git_author[0] < 286094: # HACK: revision number check is because I have an old version of the authorfile.
       if old_git_author and old_git_author[2] and git_author != old_git_author[2]:
-          print "SVN-Name-collision: %s : %s %s vs %s" % (author, 'FILE', git_author, old_git_author)
-          svn_to_git["%s@%s" % (author,old_git_author[0])] = old_git_author
+          rename_old_git_author(author, 'FILE', git_author, old_git_author)
       svn_to_git[author] = (None, None, git_author)
     else:
       if old_git_author and old_git_author[2] and git_author != old_git_author[2]:
-        print "SVN-Name-collision: %s (IGNORE) : %s %s vs %s" % (author, 'FILE', git_author, old_git_author)
+        log.warning("SVN-Name-collision: %s (IGNORE) : %s %s vs %s", author, 'FILE', git_author, old_git_author)
 
 
 def print_authors():
-  for svn_author, (rev, p, git_author) in sorted(svn_to_git.iteritems()):
-    print "%s = %s" % (svn_author, git_author)
+  sys.stdout.write(''.join(
+      "%s = %s\n" % (svn_author, git_author)
+      for svn_author, (rev, p, git_author) in sorted(svn_to_git.items())))
 
+logging.basicConfig(format="%(message)s", level=logging.WARNING)
 do_git()
 do_svn()
-gather_authors()
 #gather_from_authormap()
 print_authors()
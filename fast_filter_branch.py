@@ -9,6 +9,10 @@ couple of techniques:
 To use, import this module from your own script, and call the function
 do_filter().
 
+Works under python 2.7 and python 3. All git data (hashes, modes, paths,
+refnames, messages) is handled as bytes, just as it's read from git, so
+filters and file action regexes must use bytes too.
+
 TODO ideas:
 - Release as a standalone project.
 - Add some sort of commandline interface.
@@ -17,10 +21,25 @@ TODO ideas:
 
 """
 
+from __future__ import print_function
+
+import binascii
 import collections
+import itertools
 import os
 import subprocess
 import sys
+import time
+
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
 
 try:
   # Attempt to use https://pypi.python.org/pypi/regex
@@ -38,17 +57,49 @@ class defaultdict(collections.defaultdict):
   __repr__ = dict.__repr__
 
 
-GIT_EMPTY_TREE_HASH = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
-ALL_ZERO_HASH = '0000000000000000000000000000000000000000'
+# Size to ask for on the pipes to our git subprocesses, to let more
+# requests and replies be in flight at once. Linux-only; F_SETPIPE_SZ
+# isn't exposed by the fcntl module before python 3.10.
+PIPE_SIZE = 1 << 20
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+
+def popen_pipes(args):
+  """Starts a subprocess with large, buffered stdin and stdout pipes. The
+  caller must flush stdin before waiting on a reply."""
+  process = subprocess.Popen(args, bufsize=PIPE_SIZE, stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE)
+  if fcntl is not None and sys.platform.startswith('linux'):
+    for f in (process.stdin, process.stdout):
+      try:
+        fcntl.fcntl(f.fileno(), F_SETPIPE_SZ, PIPE_SIZE)
+      except (IOError, OSError):
+        # Over the /proc/sys/fs/pipe-max-size limit; keep the default.
+        pass
+  return process
+
+
+GIT_EMPTY_TREE_HASH = b'4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+ALL_ZERO_HASH = b'0000000000000000000000000000000000000000'
+
+# File modes which git fast-import accepts in an 'M' command, mapped to
+# themselves, so that write_tree can canonicalize with one dict lookup.
+FAST_IMPORT_MODES = dict((m, m) for m in
+                         [b'40000', b'100644', b'100755', b'120000', b'160000'])
+
+def canonical_mode(mode):
+  """Old history may contain non-standard file modes (e.g. '100664'), which
+  fast-import rejects. Canonicalize them as git itself would."""
+  if mode in FAST_IMPORT_MODES:
+    return mode
+  if int(mode, 8) & 0o111:
+    return b'100755'
+  return b'100644'
+
+OBJECT_TYPE_FROM_MODE = {b'40000': b'tree', b'160000': b'commit'}
 
 def object_type_from_mode(mode):
   """Convert from git mode string to a git object type"""
-  if mode == '40000':
-    return 'tree'
-  elif mode == '160000':
-    return 'commit'
-  else:
-    return 'blob'
+  return OBJECT_TYPE_FROM_MODE.get(mode, b'blob')
 
 
 class Commit(object):
@@ -69,25 +120,39 @@ class Commit(object):
     self.committer_date = committer_date
     self.msg = msg
 
-  def copy(self):
-    return Commit(treehash=self.treehash, parents=self.parents[:], author=self.author,
-                  author_date=self.author_date, committer=self.committer,
-                  committer_date=self.committer_date, msg=self.msg)
+  def copy(self, parents=None):
+    """Returns a copy of the commit, with a new list of 'parents' if given,
+    else a copy of this one's."""
+    # Bypasses __init__, as this is called for every commit filtered.
+    c = Commit.__new__(Commit)
+    c.treehash = self.treehash
+    if parents is None:
+      parents = self.parents[:]
+    c.parents = parents
+    c.author = self.author
+    c.author_date = self.author_date
+    c.committer = self.committer
+    c.committer_date = self.committer_date
+    c.msg = self.msg
+    return c
 
   def __eq__(self, other):
+    # copy() shares the field strings, so for an unmodified copy each of
+    # these is just a pointer comparison. Fields filters most often change
+    # go first, so that modified commits fail fast.
     return (self.treehash == other.treehash and
+            self.msg == other.msg and
             self.parents == other.parents and
             self.author == other.author and
-            self.author_date == other.author_date and
             self.committer == other.committer and
-            self.committer_date == other.committer_date and
-            self.msg == other.msg)
+            self.author_date == other.author_date and
+            self.committer_date == other.committer_date)
 
   def __ne__(self, other):
     return not self.__eq__(other)
 
   def get_tree_entry(self):
-    return TreeEntry('40000', self.treehash)
+    return TreeEntry(b'40000', self.treehash)
 
 class Tag(object):
   """Represents one tag object from Git."""
@@ -102,9 +167,14 @@ class Tag(object):
     self.msg = msg
 
   def copy(self):
-    return Tag(object_hash=self.object_hash, object_type=self.object_type,
-               name=self.name, tagger=self.tagger,
-               tagger_date=self.tagger_date, msg=self.msg)
+    t = Tag.__new__(Tag)
+    t.object_hash = self.object_hash
+    t.object_type = self.object_type
+    t.name = self.name
+    t.tagger = self.tagger
+    t.tagger_date = self.tagger_date
+    t.msg = self.msg
+    return t
 
   def __eq__(self, other):
     return (self.object_hash == other.object_hash and
@@ -126,13 +196,23 @@ class TreeEntry(object):
     assert isinstance(sub_entries, (type(None), dict))
     if sub_entries is None and githash is None:
       raise ValueError("TreeEntry requires one of githash or sub_entries arguments")
-    if sub_entries is not None and mode != '40000':
+    if sub_entries is not None and mode != b'40000':
       raise ValueError("TreeEntry can't have sub_entries on a non-directory.")
 
     object.__setattr__(self, 'mode', mode)
     object.__setattr__(self, 'githash', githash)
     object.__setattr__(self, '_sub_entries', sub_entries)
 
+  @classmethod
+  def _make(cls, mode, githash):
+    """Creates an entry from a known-good mode and githash, skipping the
+    argument checks in __init__. Used when parsing trees."""
+    e = object.__new__(cls)
+    object.__setattr__(e, 'mode', mode)
+    object.__setattr__(e, 'githash', githash)
+    object.__setattr__(e, '_sub_entries', None)
+    return e
+
   def __eq__(self, other):
     # Note: don't consider two equal if they don't have a githash.
     if self is other:
@@ -152,7 +232,7 @@ class TreeEntry(object):
     return 'TreeEntry(%r, %r)' % (self.mode, self.githash)
 
   def get_subentries(self, fm):
-    if self.mode != '40000':
+    if self.mode != b'40000':
       raise ValueError("TreeEntry can't have sub_entries on a non-directory.")
     if self._sub_entries is None:
       object.__setattr__(self, '_sub_entries', fm.get_tree(self.githash))
@@ -160,23 +240,38 @@ class TreeEntry(object):
 
   def write_subentries(self, fm):
     if self.githash is None:
-      # Write out modified subtrees if needed.
-      to_remove = []
-      for name, e in self._sub_entries.iteritems():
-        if e.githash is None:
-          e.write_subentries(fm)
-        if e.githash == GIT_EMPTY_TREE_HASH:
+      # Write out myself and all modified subtrees together.
+      files = []
+      trees = []
+      if self._gather_modified(b'', files, trees):
+        fm.write_trees(files, trees)
+
+  def _gather_modified(self, path, files, trees):
+    """Collects the (path, TreeEntry) of this modified tree and its modified
+    subtrees into 'trees', and of their other entries into 'files', removing
+    empty subtrees. Returns False if this tree turned out to be empty."""
+    to_remove = []
+    for name, e in self._sub_entries.items():
+      if e.githash is None:
+        if not e._gather_modified(path + name + b'/', files, trees):
           to_remove.append(name)
+      elif e.githash == GIT_EMPTY_TREE_HASH:
+        to_remove.append(name)
+      else:
+        files.append((path + name, e))
 
-      # Filter empty subtrees
-      for name in to_remove:
-        del self._sub_entries[name]
+    # Filter empty subtrees
+    for name in to_remove:
+      del self._sub_entries[name]
 
-      # Then, write out myself.
-      object.__setattr__(self, 'githash', fm.write_tree(self._sub_entries))
+    if not self._sub_entries:
+      object.__setattr__(self, 'githash', GIT_EMPTY_TREE_HASH)
+      return False
+    trees.append((path[:-1], self))
+    return True
 
   def remove_entry(self, fm, name):
-    assert '/' not in name
+    assert b'/' not in name
 
     r = self.get_subentries(fm)
     if name not in r:
@@ -191,7 +286,7 @@ class TreeEntry(object):
       return TreeEntry(self.mode, sub_entries = r)
 
   def add_entry(self, fm, name, entry):
-    assert '/' not in name
+    assert b'/' not in name
     if self.githash is None:
       self._sub_entries[name] = entry
       return self
@@ -203,7 +298,7 @@ class TreeEntry(object):
   def get_path(self, fm, pathsegs):
     cur = self
     for ps in pathsegs:
-      if cur.mode != '40000':
+      if cur.mode != b'40000':
         return None
       cur = cur.get_subentries(fm).get(ps, None)
       if cur is None:
@@ -235,7 +330,7 @@ class TreeEntry(object):
         return self.add_entry(fm, pathsegs[0], newsub)
       return self
 
-    newsub = TreeEntry('40000', sub_entries={})
+    newsub = TreeEntry(b'40000', sub_entries={})
     return self.add_entry(
         fm, pathsegs[0],
         newsub.add_path(fm, pathsegs[1:], newentry))
@@ -245,54 +340,91 @@ class CatFileInput(object):
   """Runs a 'git cat-file' subprocess to allow lookup of objects in a
   git repository."""
 
-  tree_re = regex.compile('([0-9]*) ([^\x00]*)\x00(.{20})', regex.DOTALL)
+  # Limit on requests sent but not yet read. cat-file stops reading its
+  # input while its output pipe is full, so this keeps the unread requests
+  # small enough to always fit in the input pipe, avoiding deadlock.
+  max_outstanding = 256
 
   def __init__(self):
-    self.process = subprocess.Popen(['git', 'cat-file', '--batch'],
-                                    stdin=subprocess.PIPE,
-                                    stdout=subprocess.PIPE)
+    self.process = popen_pipes(['git', 'cat-file', '--batch'])
+    # Requests written but whose responses have not been read, in order.
+    self._outstanding = collections.deque()
+    # Responses read from cat-file but not yet asked for.
+    self._responses = {}
+    # There are only a handful of distinct file modes, and relatively few
+    # identities, so share one string object for each, rather than keeping
+    # a copy in every TreeEntry and Commit.
+    self._modes = {}
+    self._idents = {}
+    # A 'git cat-file --batch-check', started if get_object_type is used.
+    self._check_process = None
 
   def close(self):
-    self.process.stdin.close()
-    self.process.wait()
-    if self.process.returncode != 0:
-      raise Exception('cat-file exited with non-zero exit code:',
-                      self.process.returncode)
-
-  def _parse_object(self, githash):
-    """Given a git hash, reads the object and returns (object_kind, contents)"""
-    self.process.stdin.write('%s\n' % githash)
+    for process in (self.process, self._check_process):
+      if process is None:
+        continue
+      process.stdin.close()
+      process.wait()
+      if process.returncode != 0:
+        raise Exception('cat-file exited with non-zero exit code:',
+                        process.returncode)
+
+  def request(self, githash):
+    """Asks cat-file for an object, without waiting for the reply. A later
+    _parse_object call for the same githash will use the response."""
+    if githash in self._responses or githash in self._outstanding:
+      return
+    if len(self._outstanding) >= self.max_outstanding:
+      self._read_response()
+    self.process.stdin.write(b'%s\n' % githash)
+    self._outstanding.append(githash)
+
+  def _read_response(self):
+    """Reads the reply to the oldest outstanding request."""
+    self.process.stdin.flush()
+    githash = self._outstanding.popleft()
     header = self.process.stdout.read(40) + self.process.stdout.readline()
     header_parts = header.split()
     if len(header_parts) != 3:
       raise Exception('Unexpected response from cat-file', githash, header)
 
     response = self.process.stdout.read(int(header_parts[2]))
-    if self.process.stdout.read(1) != '\n':
+    if self.process.stdout.read(1) != b'\n':
       raise Exception('Missing expected terminating newline from cat-file.')
 
-    return header_parts[1], response
+    self._responses[githash] = header_parts[1], response
+
+  def _parse_object(self, githash):
+    """Given a git hash, reads the object and returns (object_kind, contents)"""
+    self.request(githash)
+    while githash not in self._responses:
+      self._read_response()
+    return self._responses.pop(githash)
 
   def parse_tree(self, githash):
     """Given a git hash representing a tree object, returns the dict of
     (str:TreeEntry) in that tree."""
     files = {}
     kind, response = self._parse_object(githash)
-    if kind != 'tree':
+    if kind != b'tree':
       raise Exception('Unexpected object kind: %r is a %r not a tree',
                       githash, kind)
 
-    last_pos = 0
-    for entry in self.tree_re.finditer(response):
-      if last_pos != entry.start():
-        raise Exception('Unexpected tree content', last_pos, entry.start(),
-                        response[last_pos:entry.start()+1])
-      last_pos = entry.end()
-      files[entry.group(2)] = TreeEntry(entry.group(1),
-                                        entry.group(3).encode('hex'))
-
-    if last_pos != len(response):
-      raise Exception('Junk at end of tree?', githash, last_pos, len(response))
+    # Each entry is "<mode> <name>\0<20-byte sha>".
+    make_entry = TreeEntry._make
+    modes = self._modes
+    pos = 0
+    end = len(response)
+    while pos < end:
+      sp = response.find(b' ', pos)
+      nul = response.find(b'\x00', sp + 1)
+      if sp < 0 or nul < 0 or nul + 21 > end:
+        raise Exception('Unexpected tree content', githash, pos,
+                        response[pos:pos+100])
+      sha = binascii.hexlify(response[nul+1:nul+21])
+      mode = response[pos:sp]
+      files[response[sp+1:nul]] = make_entry(modes.setdefault(mode, mode), sha)
+      pos = nul + 21
     return files
 
   def parse_commit(self, githash):
@@ -301,42 +433,56 @@ class CatFileInput(object):
     commit = Commit()
 
     kind, response = self._parse_object(githash)
-    if kind != 'commit':
+    if kind != b'commit':
       Exception('Unexpected object kind: %r is a %r not a commit',
                 githash, kind)
 
-    headers, commit.msg = response.split('\n\n', 1)
-    for header in headers.split('\n'):
-      if header[0] == ' ':
+    idents = self._idents
+    encoding = None
+    # Walk the header lines in place, rather than splitting them all out.
+    headers_end = response.index(b'\n\n')
+    commit.msg = response[headers_end+2:]
+    pos = 0
+    while pos < headers_end:
+      eol = response.find(b'\n', pos)
+      if response[pos:pos+1] == b' ':
         # Continuation line -- only relevant at the moment for gpgsig, which we
         # ignore.
+        pos = eol + 1
         continue
-      header_kind, header_data = header.split(' ', 1)
-
-      encoding = None
-      if header_kind == 'tree':
+      sp = response.find(b' ', pos, eol)
+      if sp < 0:
+        raise Exception('Unexpected commit header', response[pos:eol])
+      header_kind = response[pos:sp]
+      header_data = response[sp+1:eol]
+      pos = eol + 1
+
+      if header_kind == b'tree':
         commit.treehash = header_data
-      elif header_kind == 'parent':
+      elif header_kind == b'parent':
         commit.parents.append(header_data)
-      elif header_kind == 'author':
-        commit.author, commit.author_date = header_data.split('> ', 1)
-        commit.author = commit.author + '>'
-      elif header_kind == 'committer':
-        commit.committer, commit.committer_date = header_data.split('> ', 1)
-        commit.committer = commit.committer + '>'
-      elif header_kind == 'encoding':
+      elif header_kind == b'author':
+        author, commit.author_date = header_data.split(b'> ', 1)
+        author = author + b'>'
+        commit.author = idents.setdefault(author, author)
+      elif header_kind == b'committer':
+        committer, commit.committer_date = header_data.split(b'> ', 1)
+        committer = committer + b'>'
+        commit.committer = idents.setdefault(committer, committer)
+      elif header_kind == b'encoding':
         encoding = header_data
-      elif header_kind == 'gpgsig':
+      elif header_kind == b'gpgsig':
         # Ignore gpgsig headers -- if we rewrite the commit, it's impossible to
         # re-sign it, anyways.
         pass
       else:
-        raise Exception('Unexpected commit header', header)
+        raise Exception('Unexpected commit header', header_kind, header_data)
 
     if encoding is not None:
       # I'll just eagerly re-encode commit messages from the source encoding
       # into utf-8, as git-fast-import cannot handle non-utf8 encodings.
-      msg_unicode = commit.msg.decode(encoding, error='replace')
+      msg_unicode = commit.msg.decode(encoding.decode('ascii'),
+                                       errors='replace')
       commit.msg = msg_unicode.encode('utf-8')
 
     return commit
@@ -345,56 +491,81 @@ class CatFileInput(object):
     tag = Tag()
 
     kind, response = self._parse_object(githash)
-    if kind != 'tag':
+    if kind != b'tag':
       Exception('Unexpected object kind: %r is a %r not a commit',
                 githash, kind)
 
-    headers, tag.msg = response.split('\n\n', 1)
-    for header in headers.split('\n'):
-      header_kind, header_data = header.split(' ', 1)
-
-      if header_kind == 'object':
+    headers_end = response.index(b'\n\n')
+    tag.msg = response[headers_end+2:]
+    pos = 0
+    while pos < headers_end:
+      eol = response.find(b'\n', pos)
+      sp = response.find(b' ', pos, eol)
+      if sp < 0:
+        raise Exception('Unexpected tag header', response[pos:eol])
+      header_kind = response[pos:sp]
+      header_data = response[sp+1:eol]
+      pos = eol + 1
+
+      if header_kind == b'object':
         tag.object_hash = header_data
-      elif header_kind == 'type':
-        tag.object_type = header_data
-      elif header_kind == 'tag':
+      elif header_kind == b'type':
+        tag.object_type = self._idents.setdefault(header_data, header_data)
+      elif header_kind == b'tag':
         tag.name = header_data
-      elif header_kind == 'tagger':
-        tag.tagger, tag.tagger_date = header_data.split('> ', 1)
-        tag.tagger = tag.tagger + '>'
+      elif header_kind == b'tagger':
+        tagger, tag.tagger_date = header_data.split(b'> ', 1)
+        tagger = tagger + b'>'
+        tag.tagger = self._idents.setdefault(tagger, tagger)
       else:
-        raise Exception('Unexpected tag header', header)
+        raise Exception('Unexpected tag header', header_kind, header_data)
 
     return tag
 
   def parse_blob(self, githash):
     kind, response = self._parse_object(githash)
-    if kind != 'blob':
+    if kind != b'blob':
       raise Exception('Unexpected object kind: %r is a %r not a blob',
                       githash, kind)
     return response
 
   def get_object_type(self, githash):
-    kind, response = self._parse_object(githash)
-    return kind
+    """Returns the kind of an object, without reading its contents."""
+    if githash in self._responses:
+      return self._responses[githash][0]
+    if self._check_process is None:
+      self._check_process = popen_pipes(['git', 'cat-file', '--batch-check'])
+    self._check_process.stdin.write(b'%s\n' % githash)
+    self._check_process.stdin.flush()
+    header_parts = self._check_process.stdout.readline().split()
+    if len(header_parts) != 3:
+      raise Exception('Unexpected response from cat-file', githash,
+                      header_parts)
+    return header_parts[1]
+
+
+def quote_path(name):
+  """Quote a filename for a fast-import command, if required."""
+  if name.startswith(b'"') or b'\n' in name:
+    return b'"%s"' % (name.replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+                      .replace(b'\n', b'\\n'))
+  return name
 
 
 class FastImportStream(object):
   """Runs a "git fast-import" subprocess to allow importing objects into
   a git repository."""
-  tmp_refname = 'refs/xxxx-fast-filter-tmp-ref'
+  tmp_refname = b'refs/xxxx-fast-filter-tmp-ref'
   def __init__(self):
-    self.process = subprocess.Popen(['git', 'fast-import', '--force',
-                                     '--date-format=raw', '--done'],
-                                    stdin=subprocess.PIPE,
-                                    stdout=subprocess.PIPE)
+    self.process = popen_pipes(['git', 'fast-import', '--force',
+                                '--date-format=raw', '--done'])
     self.next_mark = 1
 
   def close(self):
     # Delete the temporary refname we added
     self.reset_ref(self.tmp_refname, ALL_ZERO_HASH)
     # Close everything down
-    self.process.stdin.write('done\n')
+    self.process.stdin.write(b'done\n')
     self.process.stdin.close()
     self.process.wait()
     if self.process.returncode:
@@ -407,28 +578,62 @@ class FastImportStream(object):
     of other commits)."""
     mark = self.next_mark
     self.next_mark += 1
-    s = ('commit %s\n'
-         'mark :%d\n'
-         'author %s %s\n'
-         'committer %s %s\n'
-         'data %d\n'
-         '%s\n'
-         'from %s\n'
-         ) % (self.tmp_refname, mark, commit.author, commit.author_date,
-              commit.committer, commit.committer_date, len(commit.msg),
-              commit.msg, ALL_ZERO_HASH)
-    for p in commit.parents:
-        s += 'merge %s\n' % p
-    s += 'M 40000 %s \n\n' % commit.treehash
-    self.process.stdin.write(s)
-    return ':%d' % mark
+    parts = [(b'commit %s\n'
+              b'mark :%d\n'
+              b'author %s %s\n'
+              b'committer %s %s\n'
+              b'data %d\n'
+              b'%s\n'
+              b'from %s\n'
+              ) % (self.tmp_refname, mark, commit.author, commit.author_date,
+                   commit.committer, commit.committer_date, len(commit.msg),
+                   commit.msg, ALL_ZERO_HASH)]
+    parts.extend([b'merge %s\n' % p for p in commit.parents])
+    parts.append(b'M 40000 %s \n\n' % commit.treehash)
+    self.process.stdin.write(b''.join(parts))
+    return b':%d' % mark
+
+  def write_trees(self, files, paths):
+    """Creates a set of nested git tree objects, and returns their hashes.
+    'files' is a list of (path, TreeEntry) of everything in them (where a
+    TreeEntry may be an existing subtree), and 'paths' lists the
+    directories whose hashes to return ('' being the root).
+
+    fast-import can't write a bare tree, so this writes a throwaway
+    commit of them to tmp_refname, and asks for its subtrees."""
+    mark = self.next_mark
+    self.next_mark += 1
+    s = (b'commit %s\n'
+         b'mark :%d\n'
+         b'committer fast_filter_branch <> 0 +0000\n'
+         b'data 0\n'
+         b'from %s\n'
+         b'deleteall\n') % (self.tmp_refname, mark, ALL_ZERO_HASH)
+    modes = FAST_IMPORT_MODES
+    s += b''.join([b'M %s %s %s\n' % (modes.get(f.mode) or
+                                       canonical_mode(f.mode),
+                                       f.githash, quote_path(path))
+                   for path, f in files])
+    self.process.stdin.write(s + b'\n')
+
+    result = []
+    for i in range(0, len(paths), self.max_unread_replies):
+      batch = paths[i:i + self.max_unread_replies]
+      self.process.stdin.write(b''.join([b'ls :%d %s\n' %
+                                         (mark, quote_path(path) or b'""')
+                                         for path in batch]))
+      self.process.stdin.flush()
+      # Each response is "040000 tree <sha>\t<path>"
+      result.extend([self.process.stdout.readline().split()[2]
+                     for path in batch])
+    return result
 
   def write_tag(self, tag):
-    s = ('tag %s\n'
-         'from %s\n'
-         'tagger %s %s\n'
-         'data %d\n'
-         '%s\n') % (
+    s = (b'tag %s\n'
+         b'from %s\n'
+         b'tagger %s %s\n'
+         b'data %d\n'
+         b'%s\n') % (
              tag.name, tag.object_hash, tag.tagger, tag.tagger_date,
              len(tag.msg), tag.msg)
     self.process.stdin.write(s)
@@ -436,70 +641,116 @@ class FastImportStream(object):
   def reset_ref(self, ref, commit):
     """Sets the named 'ref' to point to the named 'commit'. (Can set it to
     a hash or a mark)"""
-    self.process.stdin.write('reset %s\nfrom %s\n\n' % (ref, commit))
+    self.process.stdin.write(b'reset %s\nfrom %s\n\n' % (ref, commit))
 
   def get_mark(self, mark):
     """Returns the SHA1 corresponding to a mark"""
-    self.process.stdin.write('get-mark %s\n' % (mark,))
+    self.process.stdin.write(b'get-mark %s\n' % (mark,))
+    self.process.stdin.flush()
     return self.process.stdout.readline().rstrip()
 
-
-class TreeImportStream(object):
-  """Runs a 'git mktree' subprocess to create trees without commits
-  (which fast-import can't do by itself unfortunately)."""
-  def __init__(self):
-    self.process = subprocess.Popen(['git', 'mktree', '-z', '--batch'],
-                                    stdin=subprocess.PIPE,
-                                    stdout=subprocess.PIPE)
-
-  def close(self):
-    self.process.stdin.close()
-    self.process.wait()
-    if self.process.returncode != 0:
-      raise Exception('mktree exited with non-zero exit code:',
-                      self.process.returncode)
-
-  def write_tree(self, files):
-    """Given a dict of (str:TreeEntry) create a git tree object, and return
-    its hash."""
-    if files:
-      s = '\x00'.join('%s %s %s\t%s' % (f.mode, object_type_from_mode(f.mode),
-                                        f.githash, name)
-                      for name,f in files.iteritems())
-      s += '\x00\x00'
-    else:
-      s = '\x00'
-    self.process.stdin.write(s)
-    return self.process.stdout.readline().strip()
-
+  # Most requests to send before reading their replies. (Bounded, so that
+  # unread replies can't fill the pipe and deadlock us.)
+  max_unread_replies = 1000
+
+  def get_marks(self, marks):
+    """Returns a list of the SHA1s corresponding to a list of marks."""
+    result = []
+    for i in range(0, len(marks), self.max_unread_replies):
+      batch = marks[i:i + self.max_unread_replies]
+      self.process.stdin.write(b''.join([b'get-mark %s\n' % mark
+                                         for mark in batch]))
+      self.process.stdin.flush()
+      result.extend([self.process.stdout.readline().rstrip() for mark in batch])
+    return result
+
+
+class BoundedCache(object):
+  """An approximately least-recently-used cache, holding up to 2*'size'
+  entries. New entries go in the young generation; once that's full, it
+  becomes the old generation, and the previous old generation is dropped.
+  Hits in the old generation move back to the young one. (Cheaper than an
+  OrderedDict, which is pure python in python 2.)"""
+  _missing = object()
+
+  def __init__(self, size):
+    self.size = size
+    self._young = {}
+    self._old = {}
+
+  def __contains__(self, key):
+    return key in self._young or key in self._old
+
+  def get(self, key, default=None):
+    value = self._young.get(key, self._missing)
+    if value is self._missing:
+      value = self._old.pop(key, self._missing)
+      if value is self._missing:
+        return default
+      self[key] = value
+    return value
+
+  def __setitem__(self, key, value):
+    if len(self._young) >= self.size:
+      self._old = self._young
+      self._young = {}
+    self._young[key] = value
+
+
+# Number of trees and commits read from git that FilterManager keeps.
+TREE_CACHE_SIZE = 200000
+COMMIT_CACHE_SIZE = 50000
 
 class FilterManager(object):
   """Wrapper for the above git import/read functionality."""
   def __init__(self):
     self._cat_file=CatFileInput()
-    self._tree_import=TreeImportStream()
     self._fast_import = FastImportStream()
 
-    self._cached_trees = {}
-    self._cached_commits = {}
+    # Trees are cached as dicts of (immutable, shared) TreeEntry.
+    self._cached_trees = BoundedCache(TREE_CACHE_SIZE)
+    self._cached_commits = BoundedCache(COMMIT_CACHE_SIZE)
+    self._cached_tags = {}
+    # Objects we've written are never evicted: cat-file can't see them
+    # until fast-import checkpoints, and a mark can't be looked up at all.
+    # So that they don't take several times the memory of a dict of
+    # TreeEntry, written trees are kept as (names, modes, packed_hashes)
+    # tuples, where packed_hashes is all the entries' SHA1s concatenated, in
+    # binary. They're unpacked into _cached_trees when read.
+    self._written_trees = {}
+    self._written_commits = {}
 
   def close(self):
     self._cat_file.close()
-    self._tree_import.close()
     self._fast_import.close()
 
   def get_tree(self, githash):
-    """Returns a list of 'TreeEntry's in a tree, given a git hash. Caches
-    the result."""
-    t = self._cached_trees.get(githash)
-    if t is not None:
-      return t
-    t = self._cat_file.parse_tree(githash)
-    self._cached_trees[githash] = t
-    return t
+    """Returns a dict of (str:TreeEntry) in a tree, given a git hash. Caches
+    the result, so each call returns a new dict."""
+    entries = self._cached_trees.get(githash)
+    if entries is None:
+      packed = self._written_trees.get(githash)
+      if packed is not None:
+        names, modes, packed_hashes = packed
+        hashes = binascii.hexlify(packed_hashes)
+        githashes = [hashes[i:i+40] for i in range(0, len(hashes), 40)]
+        entries = dict(zip(names, map(TreeEntry._make, modes, githashes)))
+      else:
+        entries = self._cat_file.parse_tree(githash)
+      self._cached_trees[githash] = entries
+    return entries.copy()
+
+  def _save_written_tree(self, githash, entries):
+    names = tuple(entries)
+    self._written_trees[githash] = (
+        names,
+        tuple([entries[name].mode for name in names]),
+        binascii.unhexlify(b''.join([entries[name].githash for name in names])))
 
   def get_commit(self, githash):
-    commit = self._cached_commits.get(githash)
+    commit = self._written_commits.get(githash)
+    if commit is None:
+      commit = self._cached_commits.get(githash)
     if commit is not None:
       return commit
     commit = self._cat_file.parse_commit(githash)
@@ -507,27 +758,61 @@ class FilterManager(object):
     return commit.copy()
 
   def get_tag(self, githash):
-    return self._cat_file.parse_tag(githash)
+    tag = self._cached_tags.get(githash)
+    if tag is None:
+      tag = self._cat_file.parse_tag(githash)
+      self._cached_tags[githash] = tag
+    return tag.copy()
+
+  def prefetch_tree(self, githash):
+    """Starts reading a tree which will be asked for by get_tree soon."""
+    if githash not in self._cached_trees and githash not in self._written_trees:
+      self._cat_file.request(githash)
+
+  def prefetch_commit(self, githash):
+    """Starts reading a commit which will be asked for by get_commit soon."""
+    if (githash not in self._cached_commits and
+        githash not in self._written_commits):
+      self._cat_file.request(githash)
 
   def get_blob(self, githash):
     return self._cat_file.parse_blob(githash)
 
   def get_mark(self, mark):
     """Returns the SHA1 corresponding to a mark"""
-    if mark.startswith(':'):
+    if mark.startswith(b':'):
       return self._fast_import.get_mark(mark)
     return mark
 
+  def get_marks(self, marks):
+    """Returns the SHA1s corresponding to a list of marks (or SHA1s)"""
+    to_resolve = [mark for mark in marks if mark.startswith(b':')]
+    resolved = dict(zip(to_resolve, self._fast_import.get_marks(to_resolve)))
+    return [resolved.get(mark, mark) for mark in marks]
+
   def write_tree(self, entries):
     """Writes a git tree given a list of 'TreeEntry's. Returns the hash,
-    and caches it."""
-    githash = self._tree_import.write_tree(entries)
-    self._cached_trees[githash] = entries
+    and caches it. (The cache is required: cat-file can't see objects
+    fast-import has written until it checkpoints.)"""
+    if not entries:
+      return GIT_EMPTY_TREE_HASH
+    githash, = self._fast_import.write_trees(entries.items(), [b''])
+    self._save_written_tree(githash, entries)
     return githash
 
+  def write_trees(self, files, trees):
+    """Writes a set of nested trees at once, given a list of (path,
+    TreeEntry) of their contents, and a list of (path, TreeEntry) of the
+    trees themselves, whose hashes get filled in and cached."""
+    hashes = self._fast_import.write_trees(files,
+                                           [path for path, tree in trees])
+    for (path, tree), githash in zip(trees, hashes):
+      object.__setattr__(tree, 'githash', githash)
+      self._save_written_tree(githash, tree._sub_entries)
+
   def write_commit(self, commit):
     mark = self._fast_import.write_commit(commit)
-    self._cached_commits[mark] = commit
+    self._written_commits[mark] = commit
     return mark
 
   def write_tag(self, tag):
@@ -539,6 +824,36 @@ class FilterManager(object):
 
 UNSET = object()
 
+# Map from path regex string -> compiled regex, so that repeated do_filter
+# runs with the same file actions share them.
+_compiled_path_res = {}
+
+def compile_path_re(path_re):
+  compiled = _compiled_path_res.get(path_re)
+  if compiled is None:
+    compiled = _compiled_path_res[path_re] = regex.compile(path_re + b'$')
+  return compiled
+
+def literal_prefix(pattern):
+  """Returns the literal text which every match of the regex 'pattern' must
+  start with (possibly the empty string)."""
+  if b'|' in pattern:
+    return b''
+  for i in range(len(pattern)):
+    c = pattern[i:i+1]
+    if c in b'.^$*+?{}[]\\|()':
+      if c in b'*?{' and i > 0:
+        # The previous character is optional.
+        i -= 1
+      return pattern[:i]
+  return pattern
+
+# Matches regex syntax which changes meaning when the regex is combined with
+# others into one alternation: a backreference, like '\1' or '(?P=name)', a
+# named group, which may be defined by another regex too, or an inline flag
+# group, like '(?i)', which applies to (or is rejected in) the whole regex.
+uncombinable_re = regex.compile(br'\\[1-9]|\(\?P[=<]|\(\?[-a-zA-Z]+[:)]')
+
 
 class _TreeTransformerBase(object):
   """Utility to transform files in a tree, based only on the existing
@@ -559,11 +874,22 @@ class _TreeTransformerBase(object):
     self._matchers_prefix_sensitive = False
     self._transforms_prefix_sensitive = prefix_sensitive
     for (path_re, action) in file_changes:
-      if not path_re.startswith('.*'):
+      if not path_re.startswith(b'.*'):
         self._matchers_prefix_sensitive = True
 
-    self._transforms = [(regex.compile(path_re + '$'), action)
+    self._transforms = [(literal_prefix(path_re), compile_path_re(path_re),
+                         action)
                         for (path_re, action) in file_changes]
+    # Map from transform list -> one regex matching any of its paths.
+    self._combined_res = {}
+    # Paths at which no transform can change anything, which therefore
+    # needn't be looked at, or cached per tree.
+    self._inert_prefixes = set()
+    # Pick the matching strategy once, rather than at every tree.
+    if supports_partial:
+      self._apply_transforms = self._apply_transforms_partial
+    else:
+      self._apply_transforms = self._apply_transforms_full
 
     self._stat_tree_cache_hits = 0
     self._stat_wrote_trees = 0
@@ -571,16 +897,16 @@ class _TreeTransformerBase(object):
     self._stat_transforms = 0
 
   def dump_stats(self):
-    print 'GlobalTreeTransformer statistics:'
-    print '  Tree cache hits:   %8d' % self._stat_tree_cache_hits
-    print '  Trees retrieved:   %8d' % self._stat_got_trees
-    print '  Trees written:     %8d' % self._stat_wrote_trees
-    print '  Transforms called: %8d' % self._stat_transforms
+    print('GlobalTreeTransformer statistics:')
+    print('  Tree cache hits:   %8d' % self._stat_tree_cache_hits)
+    print('  Trees retrieved:   %8d' % self._stat_got_trees)
+    print('  Trees written:     %8d' % self._stat_wrote_trees)
+    print('  Transforms called: %8d' % self._stat_transforms)
 
   def transform(self, oldtreehash):
-    oldtree = TreeEntry('40000', oldtreehash)
+    oldtree = TreeEntry(b'40000', oldtreehash)
     finaltree = self._transform_internal(
-        '/', oldtree, self._transforms,
+        b'/', oldtree, self._transforms,
         self._matchers_prefix_sensitive or self._transforms_prefix_sensitive)
     if finaltree is None:
       return GIT_EMPTY_TREE_HASH
@@ -591,32 +917,17 @@ class _TreeTransformerBase(object):
 
   def _transform_internal(self, prefix, oldtree, cur_transforms,
                           cur_prefix_sensitive):
-    tree = oldtree
+    if prefix in self._inert_prefixes:
+      return oldtree
 
-    if supports_partial:
-      # We're using the regex module, so we get partial match support.
-      sub_transforms = []
-      sub_prefix_sensitive = self._transforms_prefix_sensitive
-      for t in cur_transforms:
-        path_re, action = t
-        m = path_re.match(prefix, partial=True)
-        if m is not None:
-          if not path_re.pattern.startswith('.*'):
-            sub_prefix_sensitive = True
-          if m.partial:
-            sub_transforms.append(t)
-          else:
-            tree = self.invoke_transform_callback(prefix, tree, action)
-    else:
-      # The 're' module doesn't support partial matches, so we can't
-      # filter regexes as we go. Oh well.
-      sub_prefix_sensitive = cur_prefix_sensitive
-      sub_transforms = cur_transforms
-      for t in cur_transforms:
-        path_re, action = t
-        m = path_re.match(prefix)
-        if m is not None:
-          tree = self.invoke_transform_callback(prefix, tree, action)
+    tree, sub_transforms, sub_prefix_sensitive, matched = (
+        self._apply_transforms(prefix, oldtree, cur_transforms,
+                               cur_prefix_sensitive))
+
+    if not matched and not sub_transforms:
+      # No transform applies at or under this path, whatever the tree is.
+      self._inert_prefixes.add(prefix)
+      return tree
 
     if sub_transforms and tree is not None:
       self._stat_got_trees += 1
@@ -626,26 +937,91 @@ class _TreeTransformerBase(object):
 
     return tree
 
+  def _apply_transforms_partial(self, prefix, tree, cur_transforms,
+                                cur_prefix_sensitive):
+    """Applies the transforms which fully match 'prefix' to 'tree'. Returns
+    (tree, sub_transforms, sub_prefix_sensitive) for descending into it,
+    plus whether any transform was applied."""
+    # We're using the regex module, so we get partial match support.
+    matched = False
+    sub_transforms = []
+    sub_prefix_sensitive = self._transforms_prefix_sensitive
+    for t in cur_transforms:
+      literal, path_re, action = t
+      if not (prefix.startswith(literal) or literal.startswith(prefix)):
+        # Can't match anything under this prefix; skip the regex.
+        continue
+      m = path_re.match(prefix, partial=True)
+      if m is not None:
+        if not path_re.pattern.startswith(b'.*'):
+          sub_prefix_sensitive = True
+        if m.partial:
+          sub_transforms.append(t)
+        else:
+          matched = True
+          tree = self.invoke_transform_callback(prefix, tree, action)
+    return tree, sub_transforms, sub_prefix_sensitive, matched
+
+  def _apply_transforms_full(self, prefix, tree, cur_transforms,
+                             cur_prefix_sensitive):
+    # The 're' module doesn't support partial matches, so we can only
+    # filter regexes as we go by their literal prefixes.
+    matched = False
+    sub_transforms = []
+    for t in cur_transforms:
+      literal, path_re, action = t
+      if prefix.startswith(literal):
+        m = path_re.match(prefix)
+        if m is not None:
+          matched = True
+          tree = self.invoke_transform_callback(prefix, tree, action)
+      elif not literal.startswith(prefix):
+        continue
+      sub_transforms.append(t)
+    return tree, sub_transforms, cur_prefix_sensitive, matched
+
   def entries_transform_callback(self, prefix, tree, transform_list,
                                  prefix_sensitive):
-    modified = False
-    newtree = tree
-
-    for name, entry in tree.get_subentries(self.manager).items():
-      if entry.mode == '40000':
-        newentry = self._transform_internal(prefix + name + '/',
-                                            entry, transform_list,
-                                            prefix_sensitive)
-      else:
-        fullname = prefix + name
-        newentry = entry
-        for t in transform_list:
-          path_re, action = t
-          if path_re.match(fullname):
-            newentry = self.invoke_transform_callback(fullname, newentry, action)
-            if newentry is None:
-              break
+    entries = tree.get_subentries(self.manager).items()
+    dirs = [(name, entry) for name, entry in entries if entry.mode == b'40000']
+    files = [(name, entry) for name, entry in entries if entry.mode != b'40000']
+
+    # Ask for all the subtrees up front, rather than waiting for each one
+    # in turn.
+    for name, entry in dirs:
+      if self._will_descend(prefix + name + b'/', entry, transform_list,
+                            prefix_sensitive):
+        self.manager.prefetch_tree(entry.githash)
+
+    # List of (name, old entry, new entry)
+    changes = []
+    for name, entry in dirs:
+      newentry = self._transform_internal(prefix + name + b'/',
+                                          entry, transform_list,
+                                          prefix_sensitive)
+      if newentry is not entry:
+        changes.append((name, entry, newentry))
+
+    combined_re = self._get_combined_re(transform_list)
+    matchers = [(path_re.match, action)
+                for literal, path_re, action in transform_list]
+    for name, entry in files:
+      fullname = prefix + name
+      # Most files match none of the transforms, so check them all at
+      # once before trying each one.
+      if combined_re is not None and not combined_re.match(fullname):
+        continue
+      newentry = entry
+      for match, action in matchers:
+        if match(fullname):
+          newentry = self.invoke_transform_callback(fullname, newentry, action)
+          if newentry is None:
+            break
+      if newentry is not entry:
+        changes.append((name, entry, newentry))
 
+    newtree = tree
+    for name, entry, newentry in changes:
       if newentry is None:
         newtree = newtree.remove_entry(self.manager, name)
       elif newentry != entry:
@@ -653,6 +1029,48 @@ class _TreeTransformerBase(object):
 
     return newtree
 
+  def _get_combined_re(self, transform_list):
+    """Returns a single regex matching a path if any regex in
+    transform_list does, or None if they can't be combined."""
+    key = tuple(transform_list)
+    combined_re = self._combined_res.get(key, UNSET)
+    if combined_re is UNSET:
+      patterns = [t[1].pattern for t in transform_list]
+      combined_re = None
+      if len(patterns) >= 2 and not any(uncombinable_re.search(p)
+                                        for p in patterns):
+        try:
+          combined_re = regex.compile(
+              b'|'.join(b'(?:%s)' % p for p in patterns))
+        except regex.error:
+          # Just check each regex separately.
+          pass
+      self._combined_res[key] = combined_re
+    return combined_re
+
+  def _will_descend(self, prefix, entry, transform_list, prefix_sensitive):
+    """Returns whether _transform_internal is likely to read the contents
+    of the directory 'entry'."""
+    if prefix in self._inert_prefixes:
+      return False
+    will_descend = False
+    for literal, path_re, action in transform_list:
+      if not (prefix.startswith(literal) or literal.startswith(prefix)):
+        continue
+      if supports_partial:
+        m = path_re.match(prefix, partial=True)
+        if m is None:
+          continue
+        full_match = not m.partial
+      else:
+        full_match = path_re.match(prefix) is not None
+      if full_match:
+        # The action may well delete or replace the directory, and then a
+        # prefetched reply would never be read.
+        return False
+      will_descend = True
+    return will_descend
+
   def invoke_transform_callback(self, pathname, oldtree, action):
     self._stat_transforms += 1
     return action(self.manager, pathname, oldtree)
@@ -668,73 +1086,173 @@ class _TreeTransformerBase(object):
     #   print res and res._sub_entries
     # return res
 
+# Version of the file format written by CachingTreeTransformer.save_cache.
+TREE_CACHE_FORMAT = 2
+
 class CachingTreeTransformer(_TreeTransformerBase):
   def __init__(self, manager, file_changes=[], prefix_sensitive=True):
     _TreeTransformerBase.__init__(self, manager, file_changes, prefix_sensitive)
 
-    # Map from (prefix_path, tree_hash) -> new_tree_hash
+    # Map from prefix_path -> {tree_hash -> new_tree}. prefix_path is None
+    # for trees cached without regard to their location. (Nested, rather
+    # than keyed by tuple, to avoid building a tuple for every lookup.)
     self._mapping = {}
 
-  def _transform_internal(self, prefix, oldtree, cur_transforms, cur_prefix_sensitive):
-    if cur_prefix_sensitive:
+    # Identifies the file_changes a saved mapping was computed with, apart
+    # from the actions themselves: nothing about a function reliably tells
+    # whether it behaves the same as in an earlier run, so the caller passes
+    # a version to load_cache and save_cache instead.
+    self._cache_key = (prefix_sensitive,
+                       [path_re for (path_re, action) in file_changes])
+
+  def load_cache(self, filename, version):
+    """Loads the tree mapping saved by save_cache, if it exists and was
+    saved with the same path regexes and version. The caller must change
+    the version whenever the actions' behavior changes. Entries whose new
+    trees are no longer in the repository (e.g. were garbage collected) are
+    dropped."""
+    if not os.path.exists(filename):
+      return
+    with open(filename, 'rb') as f:
+      data = pickle.load(f)
+    if data[0] != TREE_CACHE_FORMAT:
+      print('Ignoring tree cache %s: old file format.' % filename)
+      return
+    unused_format, cache_key, saved_mapping = data
+    if cache_key != (version, self._cache_key):
+      print('Ignoring tree cache %s: file actions or version have changed.' %
+            filename)
+      return
+    # Many of the new trees aren't reachable from any ref (e.g. ones only
+    # written by write_trees' throwaway commits), so may have been gc'd.
+    # (Submodule entries refer to commits in another repository.)
+    missing = missing_objects(set(
+        new[1] for saved in saved_mapping.values() for new in saved.values()
+        if new is not None and new[0] != b'160000'))
+    if missing:
+      print('Tree cache %s: dropping %d missing trees.' %
+            (filename, len(missing)))
+    for cache_prefix, saved in saved_mapping.items():
+      mapping = self._mapping.setdefault(cache_prefix, {})
+      for oldhash, new in saved.items():
+        # A directory action may have replaced the tree with something
+        # else, like a blob or a submodule, so the mode is saved too.
+        if new is None:
+          mapping[oldhash] = None
+        elif new[1] not in missing:
+          mapping[oldhash] = TreeEntry(*new)
+
+  def save_cache(self, filename, version):
+    """Saves the tree mapping, so a later run can skip recomputing it."""
+    saved_mapping = {}
+    for cache_prefix, mapping in self._mapping.items():
+      saved_mapping[cache_prefix] = dict(
+          (oldhash, entry and (entry.mode, entry.githash))
+          for oldhash, entry in mapping.items())
+    with open(filename + '.tmp', 'wb') as f:
+      pickle.dump((TREE_CACHE_FORMAT, (version, self._cache_key),
+                   saved_mapping), f,
+                  pickle.HIGHEST_PROTOCOL)
+    os.rename(filename + '.tmp', filename)
+
+  def _get_mapping(self, prefix, prefix_sensitive):
+    if prefix_sensitive:
       cache_prefix = prefix
     else:
       cache_prefix = None
-    assert oldtree.mode == '40000'
+    mapping = self._mapping.get(cache_prefix)
+    if mapping is None:
+      mapping = self._mapping[cache_prefix] = {}
+    return mapping
+
+  def _transform_internal(self, prefix, oldtree, cur_transforms, cur_prefix_sensitive):
+    assert oldtree.mode == b'40000'
     assert oldtree.githash
-    tree = self._mapping.get((cache_prefix, oldtree.githash), UNSET)
+    if prefix in self._inert_prefixes:
+      return oldtree
+    mapping = self._get_mapping(prefix, cur_prefix_sensitive)
+    tree = mapping.get(oldtree.githash, UNSET)
     if tree is not UNSET:
       self._stat_tree_cache_hits += 1
       return tree
 
     tree = _TreeTransformerBase._transform_internal(self, prefix, oldtree, cur_transforms, cur_prefix_sensitive)
+    if prefix in self._inert_prefixes:
+      # Nothing to remember per tree.
+      return tree
 
     # Make immutable
     if tree is not None:
       tree.write_subentries(self.manager)
-    self._mapping[(cache_prefix, oldtree.githash)] = tree
+    mapping[oldtree.githash] = tree
     return tree
 
+  def _will_descend(self, prefix, entry, transform_list, prefix_sensitive):
+    if entry.githash in self._get_mapping(prefix, prefix_sensitive):
+      return False
+    return _TreeTransformerBase._will_descend(self, prefix, entry,
+                                              transform_list, prefix_sensitive)
+
+def to_str(s):
+  """Converts git data to a native string, for printing."""
+  if isinstance(s, str):
+    return s
+  return s.decode('utf-8', 'replace')
+
+def missing_objects(githashes):
+  """Returns the set of the given object hashes which aren't in the
+  repository."""
+  p = subprocess.Popen(['git', 'cat-file', '--batch-check=%(objectname)'],
+                       stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+  output, unused_err = p.communicate(b''.join(githash + b'\n'
+                                              for githash in githashes))
+  if p.returncode != 0:
+    raise Exception('cat-file exited with non-zero exit code:', p.returncode)
+  # Found objects are printed as just their hash, others as '<hash> missing'.
+  return set(line.split(b' ')[0] for line in output.split(b'\n')
+             if line.endswith(b' missing'))
+
 def list_branches_tags():
   return subprocess.check_output(['git', '-c', 'core.warnAmbiguousRefs=false',
                                   'rev-parse', '--symbolic-full-name',
-                                  '--branches', '--tags']).split('\n')[:-1]
+                                  '--branches', '--tags']).split(b'\n')[:-1]
 
 def update_refs(fm, reflist, revmap, backup_prefix, tag_filter, msg_filter):
-  print 'Updating refs...'
+  print('Updating refs...')
 
   proc = subprocess.Popen(['git', 'for-each-ref'] + reflist,
                           stdout=subprocess.PIPE)
   for line in proc.stdout:
-    line = line.rstrip('\n')
-    githash_and_kind, refname = line.split('\t', 1)
-    githash, kind = githash_and_kind.split(' ')
-    if kind == 'commit':
+    line = line.rstrip(b'\n')
+    githash_and_kind, refname = line.split(b'\t', 1)
+    githash, kind = githash_and_kind.split(b' ')
+    if kind == b'commit':
       if githash in revmap:
-        print 'Updating REF %s %s -> %s' % (refname, githash, revmap[githash])
+        print('Updating REF %s %s -> %s' % (to_str(refname), to_str(githash),
+                                            to_str(revmap[githash])))
         if backup_prefix:
           # Create backup of original ref
-          fm.reset_ref(backup_prefix + '/' + refname, githash)
+          fm.reset_ref(backup_prefix + b'/' + refname, githash)
         # Reset to new commit
         fm.reset_ref(refname, revmap[githash])
-    elif kind == 'tag':
+    elif kind == b'tag':
       tagobj = fm.get_tag(githash)
-      if 'refs/tags/' + tagobj.name != refname:
-        print 'WARNING: tag %s has mismatched tagname: %s' % (
-            refname, tagobj.name)
+      if b'refs/tags/' + tagobj.name != refname:
+        print('WARNING: tag %s has mismatched tagname: %s' % (
+            to_str(refname), to_str(tagobj.name)))
         continue
 
-      if tagobj.object_type != 'commit':
-        print 'WARNING: tag %s points to %s, not to a commit' % (
-            refname, tagobj.object_type)
+      if tagobj.object_type != b'commit':
+        print('WARNING: tag %s points to %s, not to a commit' % (
+            to_str(refname), to_str(tagobj.object_type)))
         continue
 
       # Strip the signature -- and do this before storing in oldtagobj
       # for comparison, so that we're only rewriting the tag if there
       # are OTHER changes.
       was_signed = False
-      if '\n-----BEGIN PGP SIGNATURE-----\n' in tagobj.msg:
-        tagobj.msg = tagobj.msg.split('\n-----BEGIN PGP SIGNATURE-----\n')[0]
+      if b'\n-----BEGIN PGP SIGNATURE-----\n' in tagobj.msg:
+        tagobj.msg = tagobj.msg.split(b'\n-----BEGIN PGP SIGNATURE-----\n')[0]
         was_signed = True
       oldtagobj = tagobj.copy()
 
@@ -747,14 +1265,14 @@ def update_refs(fm, reflist, revmap, backup_prefix, tag_filter, msg_filter):
         tagobj = tag_filter(fm, tagobj)
 
       if tagobj != oldtagobj:
-        print 'Updating TAG %s' % (refname,)
+        print('Updating TAG %s' % (to_str(refname),))
         if backup_prefix:
           # Create backup ref
-          fm.reset_ref(backup_prefix + '/' + refname, githash)
+          fm.reset_ref(backup_prefix + b'/' + refname, githash)
         fm.write_tag(tagobj)
         if was_signed:
-          print 'WARNING: stripped signature from tag %s (%s)' % (
-              refname, githash)
+          print('WARNING: stripped signature from tag %s (%s)' % (
+              to_str(refname), to_str(githash)))
     else:
       raise Exception('Unexpected ref to kind', kind)
 
@@ -763,10 +1281,18 @@ def update_refs(fm, reflist, revmap, backup_prefix, tag_filter, msg_filter):
     raise Exception('for-each-ref exited with non-zero exit code:',
                     proc.returncode)
 
+# Number of commits do_filter requests from cat-file ahead of need.
+PREFETCH_COMMITS = 64
+
 def do_filter(commit_filter=None, tag_filter=None, global_file_actions=None,
               prefix_sensitive=True, msg_filter=None,
-              backup_prefix='refs/original', revmap_filename=None, reflist=None,
-              filter_manager=None):
+              backup_prefix=b'refs/original', revmap_filename=None,
+              reflist=None, filter_manager=None, tree_cache_filename=None,
+              tree_cache_version=None):
+  if tree_cache_filename and tree_cache_version is None:
+    # The tree cache can't tell whether the file actions have changed since
+    # it was saved, so the caller has to say, by changing the version.
+    raise Exception('tree_cache_filename requires a tree_cache_version')
   if filter_manager:
     fm = filter_manager
   else:
@@ -774,40 +1300,62 @@ def do_filter(commit_filter=None, tag_filter=None, global_file_actions=None,
 
   if global_file_actions:
     gtt = CachingTreeTransformer(fm, file_changes=global_file_actions, prefix_sensitive=prefix_sensitive)
+    if tree_cache_filename:
+      gtt.load_cache(tree_cache_filename, tree_cache_version)
   else:
     gtt = None
 
   if reflist is None:
     reflist = list_branches_tags()
 
-  print 'Getting list of commits...'
-  # Get list of commits to work on:
-  revlist = subprocess.check_output(['git', 'rev-list', '--reverse',
-                                     '--topo-order'] + reflist).split('\n')[:-1]
+  print('Getting list of commits...')
+  # Get list of commits to work on. This is streamed, rather than read into
+  # memory all at once; only the total is needed up front.
+  num_revs = int(subprocess.check_output(['git', 'rev-list', '--count'] +
+                                         reflist))
+  revlist_proc = subprocess.Popen(['git', 'rev-list', '--reverse',
+                                   '--topo-order'] + reflist,
+                                  bufsize=PIPE_SIZE, stdout=subprocess.PIPE)
+  revlist = (line.rstrip(b'\n') for line in revlist_proc.stdout)
 
   if revmap_filename and os.path.exists(revmap_filename):
-    revmap = dict(l.strip().split(' ') for l in open(revmap_filename, 'r'))
+    with open(revmap_filename, 'rb') as revmap_in:
+      revmap = dict(l.strip().split(b' ') for l in revmap_in)
   else:
     revmap={}
 
-  print 'Filtering...'
+  print('Filtering...')
   progress = 0
-  for rev in revlist:
+  # Progress is only worth showing on a terminal; limit it to a few updates
+  # a second.
+  show_progress = sys.stdout.isatty()
+  last_progress = 0
+  upcoming = collections.deque()
+  while True:
+    # Keep cat-file busy reading the commits we'll need next.
+    if len(upcoming) <= PREFETCH_COMMITS:
+      for nextrev in itertools.islice(revlist, PREFETCH_COMMITS):
+        upcoming.append(nextrev)
+        if nextrev not in revmap:
+          fm.prefetch_commit(nextrev)
+    if not upcoming:
+      break
+    rev = upcoming.popleft()
     progress += 1
 
     if rev in revmap:
       # If this commit was already processed (with an input revmap), skip
       continue
 
-    if progress % 100 == 0:
-      print ' [%d/%d]\r' % (progress, len(revlist)),
+    if show_progress and time.time() - last_progress >= 0.25:
+      last_progress = time.time()
+      sys.stdout.write(' [%d/%d]\r' % (progress, num_revs))
       sys.stdout.flush()
 
     oldcommit = fm.get_commit(rev)
-    commit = oldcommit.copy()
-
-    oldparents = commit.parents
-    commit.parents = [revmap.get(p, p) for p in commit.parents]
+    # A copy, as oldcommit is the cached one, and filters may change it.
+    oldparents = list(oldcommit.parents)
+    commit = oldcommit.copy(parents=[revmap.get(p, p) for p in oldparents])
 
     updatefunc = None
 
@@ -818,7 +1366,7 @@ def do_filter(commit_filter=None, tag_filter=None, global_file_actions=None,
 
     if commit_filter is not None:
       result = commit_filter(fm, rev, commit, oldparents)
-      if isinstance(result, str):
+      if isinstance(result, bytes):
         # Special case: string result
         if result != rev:
           revmap[rev] = result
@@ -834,18 +1382,24 @@ def do_filter(commit_filter=None, tag_filter=None, global_file_actions=None,
       if updatefunc is not None:
         updatefunc(newhash)
 
+  revlist_proc.wait()
+  if revlist_proc.returncode != 0:
+    raise Exception('rev-list exited with non-zero exit code:',
+                    revlist_proc.returncode)
+
   update_refs(fm, reflist, revmap, backup_prefix, tag_filter, msg_filter)
 
   if revmap_filename:
-    revmap_out = open(revmap_filename + '.tmp', 'w')
-    for oldrev, newrev in revmap.iteritems():
-      # Make sure the revs we're writing are real sha1s, not marks
-      newrev = fm.get_mark(newrev)
-      revmap_out.write('%s %s\n' % (oldrev, newrev))
+    oldrevs = list(revmap)
+    # Make sure the revs we're writing are real sha1s, not marks
+    newrevs = fm.get_marks([revmap[oldrev] for oldrev in oldrevs])
+    with open(revmap_filename + '.tmp', 'wb') as revmap_out:
+      revmap_out.writelines([b'%s %s\n' % (oldrev, newrev)
+                             for oldrev, newrev in zip(oldrevs, newrevs)])
 
   if gtt is not None:
     gtt.dump_stats()
-  print 'Filtered %d commits, %d were changed.' % (len(revlist), len(revmap))
+  print('Filtered %d commits, %d were changed.' % (num_revs, len(revmap)))
 
   if not filter_manager:
     # Don't close if we were passed one on input
@@ -853,3 +1407,8 @@ def do_filter(commit_filter=None, tag_filter=None, global_file_actions=None,
 
   if revmap_filename:
     os.rename(revmap_filename + '.tmp', revmap_filename)
+
+  if gtt is not None and tree_cache_filename:
+    # Saved last, so that an interrupted run doesn't leave behind a cache
+    # referring to trees that were never written.
+    gtt.save_cache(tree_cache_filename, tree_cache_version)
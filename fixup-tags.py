@@ -30,28 +30,37 @@
 # branch and actually edited.
 
 
+from __future__ import print_function
+
 import subprocess
 import fast_filter_branch
 import re
 import time
 
+# Memo for format_raw_time; commits made together often share a timestamp.
+formatted_raw_times = {}
+
 def format_raw_time(raw_time):
-  int_time, tz = raw_time.split(' ')
-  int_time = int(int_time)
-  time_tuple = time.gmtime(int_time)
-  return time.strftime("%a %b %d %H:%M:%S %Y ", time_tuple) + tz
+  formatted = formatted_raw_times.get(raw_time)
+  if formatted is None:
+    int_time, _, tz = raw_time.rpartition(b' ')
+    time_tuple = time.gmtime(int(int_time))
+    formatted = formatted_raw_times[raw_time] = (
+        time.strftime("%a %b %d %H:%M:%S %Y ", time_tuple).encode('ascii') +
+        tz)
+  return formatted
 
 # Let's pretend some tag heads were different; typically someone made an extra
 # commit to the tag after it was created.
 SPECIAL_CASED_TAG_REPLACEMENTS = {
     # A commit added lldb and polly at a different base rev.
-    'refs/heads/svntag/RELEASE_33/rc1': 'refs/heads/svntag/RELEASE_33/rc1^',
+    b'refs/heads/svntag/RELEASE_33/rc1': b'refs/heads/svntag/RELEASE_33/rc1^',
     # Added extra PPC release notes directly to the tag.
-    'refs/heads/svntag/RELEASE_33/rc3': 'refs/heads/svntag/RELEASE_33/rc3^',
+    b'refs/heads/svntag/RELEASE_33/rc3': b'refs/heads/svntag/RELEASE_33/rc3^',
     # Added libunwind at a different base rev.
-    'refs/heads/svntag/RELEASE_370/rc1': 'refs/heads/svntag/RELEASE_370/rc1^',
+    b'refs/heads/svntag/RELEASE_370/rc1': b'refs/heads/svntag/RELEASE_370/rc1^',
     # Added extra PPC release notes.
-    'refs/heads/svntag/RELEASE_390/rc2': 'refs/heads/svntag/RELEASE_390/rc2^',
+    b'refs/heads/svntag/RELEASE_390/rc2': b'refs/heads/svntag/RELEASE_390/rc2^',
 }
 
 # Leaving unhandled: RELEASE_33/dot1-rc2; it's a mess and there was no 3.3.1 final anyways.
@@ -61,68 +70,78 @@ SPECIAL_CASED_TAG_REPLACEMENTS = {
 SPECIAL_CASED_TAG_BASES = {
     # These all were created with the wrong parent commit, but a tree matching
     # the correct parent.
-    'refs/heads/svntag/RELEASE_22': 'refs/heads/release_22',
-    'refs/heads/svntag/RELEASE_20': 'refs/heads/release_20',
-    'refs/heads/svntag/RELEASE_19': 'refs/heads/release_19~9',
-    'refs/heads/svntag/RELEASE_16': 'refs/heads/release_16',
-    'refs/heads/svntag/RELEASE_15': 'refs/heads/release_15',
+    b'refs/heads/svntag/RELEASE_22': b'refs/heads/release_22',
+    b'refs/heads/svntag/RELEASE_20': b'refs/heads/release_20',
+    b'refs/heads/svntag/RELEASE_19': b'refs/heads/release_19~9',
+    b'refs/heads/svntag/RELEASE_16': b'refs/heads/release_16',
+    b'refs/heads/svntag/RELEASE_15': b'refs/heads/release_15',
     # extraneous file llvm/docs/LLVMVsTheWorld.html in the tag.
-    'refs/heads/svntag/RELEASE_14': 'refs/heads/release_14',
+    b'refs/heads/svntag/RELEASE_14': b'refs/heads/release_14',
     # missing file llvm/lib/Support/ConstantRange.cpp in the tag.
-    'refs/heads/svntag/RELEASE_13': 'refs/heads/release_13',
+    b'refs/heads/svntag/RELEASE_13': b'refs/heads/release_13',
     # Wrong parent again.
-    'refs/heads/svntag/RELEASE_12': 'refs/heads/release_12',
+    b'refs/heads/svntag/RELEASE_12': b'refs/heads/release_12',
     # extraneous file llvm/docs/LLVMVsTheWorld.html
-    'refs/heads/svntag/RELEASE_11': 'refs/heads/release_11',
+    b'refs/heads/svntag/RELEASE_11': b'refs/heads/release_11',
     # extraneous file llvm/docs/ReleaseTasks.html
-    'refs/heads/svntag/RELEASE_1': 'refs/heads/release_1',
+    b'refs/heads/svntag/RELEASE_1': b'refs/heads/release_1',
 }
 
+def is_subset_tree(tag_tree, parent_tree):
+  """Returns whether every entry of tag_tree is also in parent_tree."""
+  for name, entry in tag_tree.items():
+    parent_entry = parent_tree.get(name)
+    if parent_entry is None or parent_entry != entry:
+      return False
+  return True
+
 # We rename the official release tags to "llvmorg-7.0.1-rc1" or "llvmorg-7.0.0"
+#
+# Splits "RELEASE_<vers>[/<kind>]" into vers and kind, also handling the weird
+# names used in 34 and 35 releases: (34, dot1-final) -> (341, final)
+release_tagname_re = re.compile(br'RELEASE_([^/]*)(?:/(?:dot([0-9])-)?(.*))?$')
+
 def map_tagname(oldname):
-  if not oldname.startswith("RELEASE_"):
-    return oldname
-  if oldname == 'RELEASE_342/final':
+  if oldname == b'RELEASE_342/final':
     return oldname # duplicate
+  m = release_tagname_re.match(oldname)
+  if not m:
+    return oldname
 
-  oldname = oldname[len("RELEASE_"):]
-  if '/' in oldname:
-    vers, kind = oldname.split('/', 1)
-  else:
-    vers, kind = oldname, ''
-
-  # Handle the weird names used in 34 and 35 releases;
-  # Map (34, dot1-final) -> (341, final)
-  dotfoo = re.match("dot([0-9])-(.*)$", kind)
-  if dotfoo:
-    vers += dotfoo.group(1)
-    kind = dotfoo.group(2)
+  vers, dot, kind = m.groups()
+  if dot:
+    vers += dot
+  if kind is None:
+    kind = b''
 
   # e.g. 1 -> 100, 27 -> 270
-  while len(vers) < 3:
-    vers += '0'
+  vers = vers.ljust(3, b'0')
 
   # Add dots to version
-  vers = vers[0:-2] + "." + vers[-2:-1] + "." + vers[-1:]
+  vers = vers[0:-2] + b"." + vers[-2:-1] + b"." + vers[-1:]
 
   # Remove "final"
-  if kind == "final":
-    kind = ""
+  if kind == b"final":
+    kind = b""
 
   if kind:
-    return "llvmorg-" + vers + '-' + kind
+    return b"llvmorg-" + vers + b'-' + kind
   else:
-    return "llvmorg-" + vers
+    return b"llvmorg-" + vers
 
 
-def convert_tagref(fm, tagname, branch_rev_set):
-  tag_commit = fm.get_commit(SPECIAL_CASED_TAG_REPLACEMENTS.get(tagname, tagname))
-  if tag_commit.treehash == fast_filter_branch.GIT_EMPTY_TREE_HASH:
+def convert_tagref(fm, tagname, tag_hash, tag_head, tag_treehash,
+                   branch_rev_set):
+  """Converts the tag branch 'tagname', at 'tag_hash'. 'tag_head' is the
+  commit to treat as its head (which differs for
+  SPECIAL_CASED_TAG_REPLACEMENTS), and 'tag_treehash' is its tree."""
+  if tag_treehash == fast_filter_branch.GIT_EMPTY_TREE_HASH:
     # If we have an empty tree, just remove the tag.
-    print "%s: OK: empty tree, removing" % tagname
-    fm.reset_ref('refs/pre-fixup-tags/' + tagname, tagname)
+    print("%s: OK: empty tree, removing" % fast_filter_branch.to_str(tagname))
+    fm.reset_ref(b'refs/pre-fixup-tags/' + tagname, tag_hash)
     fm.reset_ref(tagname, fast_filter_branch.ALL_ZERO_HASH)
     return
+  tag_commit = fm.get_commit(tag_head)
 
 
   # Loop over revisions down first-parent from the tag ref, looking
@@ -141,7 +160,7 @@ def convert_tagref(fm, tagname, branch_rev_set):
 
   while True:
     if len(commit.parents) != 1 and len(commit.parents) != 2:
-      print "%s: ERR: weird commit parents." % tagname
+      print("%s: ERR: weird commit parents." % fast_filter_branch.to_str(tagname))
       return
 
     if commit.parents[-1] in branch_rev_set:
@@ -160,56 +179,143 @@ def convert_tagref(fm, tagname, branch_rev_set):
 
   if selected_parent is None:
     # Normal case -- we don't have a special case, so just search.
+    tag_tree = None
     for tag_parent_hash in tag_parent_hash_candidates:
-      # Check if the trees are equivalent, per definition at the top.
-      tag_tree = fm.get_tree(tag_commit.treehash)
-      parent_tree = fm.get_tree(fm.get_commit(tag_parent_hash).treehash)
-      #print "Trees:", tag_tree, parent_tree
-
-      if not any(entry not in parent_tree.iteritems() for entry in tag_tree.iteritems()):
-        # Matching trees, yay!
-        selected_parent = tag_parent_hash
-        break
+      # Check if the trees are equivalent, per definition at the top. Usually
+      # the tag has every subproject, so the tree hashes are just equal.
+      parent_treehash = fm.get_commit(tag_parent_hash).treehash
+      if parent_treehash != tag_commit.treehash:
+        if tag_tree is None:
+          tag_tree = fm.get_tree(tag_commit.treehash)
+        parent_tree = fm.get_tree(parent_treehash)
+        #print "Trees:", tag_tree, parent_tree
+        if not is_subset_tree(tag_tree, parent_tree):
+          continue
+
+      # Matching trees, yay!
+      selected_parent = tag_parent_hash
+      break
 
   # Did we find anything?
   if selected_parent is not None:
     # OKAY! Let's make the tag!
-    new_tagname = map_tagname(re.sub('refs/heads/svntag/', '', tagname))
-    newtag = fast_filter_branch.Tag(object_hash=selected_parent, name=new_tagname,
-                                    tagger=tag_commit.committer, tagger_date=tag_commit.committer_date,
-                                    msg=tag_commit.msg)
-
+    new_tagname = map_tagname(re.sub(b'refs/heads/svntag/', b'', tagname))
+    msg_parts = [tag_commit.msg]
     if len(commits_in_tag) > 1:
-      newtag.msg += '\n--\nSVN tag also included these previous commits:\n'
+      msg_parts.append(b'\n--\nSVN tag also included these previous commits:\n')
     for c in commits_in_tag[1:]:
-      newtag.msg += ("\n"
-                     "Author: %s\n"
-                     "Date: %s\n"
-                     "\n"
-                     "    %s\n") % (c.author, format_raw_time(c.author_date), c.msg.rstrip().replace('\n', '\n    '))
+      msg_parts.append((b"\n"
+                        b"Author: %s\n"
+                        b"Date: %s\n"
+                        b"\n"
+                        b"    %s\n") % (c.author, format_raw_time(c.author_date), c.msg.rstrip().replace(b'\n', b'\n    ')))
+
+    newtag = fast_filter_branch.Tag(object_hash=selected_parent, name=new_tagname,
+                                    tagger=tag_commit.committer, tagger_date=tag_commit.committer_date,
+                                    msg=b''.join(msg_parts))
 
     # Backup ref, clear it, and write the tag
-    fm.reset_ref('refs/pre-fixup-tags/' + tagname, tagname)
+    fm.reset_ref(b'refs/pre-fixup-tags/' + tagname, tag_hash)
     fm.reset_ref(tagname, fast_filter_branch.ALL_ZERO_HASH)
     fm.write_tag(newtag)
-    print "%s: OK: Wrote as a real tag, superseding %d commits!" % (tagname, len(commits_in_tag))
+    print("%s: OK: Wrote as a real tag, superseding %d commits!" % (fast_filter_branch.to_str(tagname), len(commits_in_tag)))
     return
 
-  print "%s: ERR: tree not equivalent to potential parents %s" % (tagname, list(tag_parent_hash_candidates))
+  print("%s: ERR: tree not equivalent to potential parents %s" % (fast_filter_branch.to_str(tagname), [fast_filter_branch.to_str(h) for h in tag_parent_hash_candidates]))
+
+
+def rev_list_first_parent(refs, args=[]):
+  """Yields the lines of 'git rev-list --first-parent' of refs. (Which may
+  include '^ref', to exclude the revisions reachable from ref.)"""
+  # Streamed, rather than reading the (huge) output in as one string, and
+  # with the refs given on stdin, to stay under the argument length limit.
+  proc = subprocess.Popen(['git', 'rev-list', '--first-parent', '--stdin'] +
+                          args,
+                          stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                          bufsize=fast_filter_branch.PIPE_SIZE)
+  proc.stdin.write(b''.join(ref + b'\n' for ref in refs))
+  proc.stdin.close()
+  for line in proc.stdout:
+    yield line
+  proc.wait()
+  if proc.returncode != 0:
+    raise Exception('rev-list exited with non-zero exit code:',
+                    proc.returncode)
+
+
+def first_parent_revs(refs):
+  """Returns the set of revisions along the first-parentage of refs."""
+  return set(line.rstrip(b'\n') for line in rev_list_first_parent(refs))
+
+
+def first_parent_parents(refs):
+  """Returns a dict mapping each revision along the first-parentage of refs
+  to the list of its parents."""
+  parents = {}
+  for line in rev_list_first_parent(refs, ['--parents']):
+    revs = line.split()
+    parents[revs[0]] = revs[1:]
+  return parents
+
+
+def list_refs_with_trees():
+  """Returns a list of (refname, githash, treehash) for all branches and
+  tags. (treehash is empty for refs to tag objects.)"""
+  output = subprocess.check_output(['git', 'for-each-ref',
+                                    '--format=%(refname) %(objectname) %(tree)',
+                                    'refs/heads', 'refs/tags'])
+  return [line.split(b' ') for line in output.split(b'\n')[:-1]]
 
 
 def main():
   fm = fast_filter_branch.FilterManager()
-  refs = fast_filter_branch.list_branches_tags()
+  refs = list_refs_with_trees()
 
-  branches = [ref for ref in refs if not ref.startswith('refs/heads/svntag')]
-  tags = [ref for ref in refs if ref.startswith('refs/heads/svntag')]
+  branches = [ref for ref, githash, treehash in refs
+              if not ref.startswith(b'refs/heads/svntag')]
+  tags = [(ref, githash, treehash) for ref, githash, treehash in refs
+          if ref.startswith(b'refs/heads/svntag')]
 
   # List all the revisions along the first-parentage of branches.
-  branch_rev_set = set(subprocess.check_output(['git', 'rev-list', '--first-parent'] + branches).split('\n')[:-1])
+  branch_rev_set = first_parent_revs(branches)
+
+  # Look up the commits (and trees) of the special-cased tag heads, so that
+  # they're read by hash, like everything else.
+  replaced = [tag for tag, githash, treehash in tags
+              if tag in SPECIAL_CASED_TAG_REPLACEMENTS]
+  replacement_revs = []
+  for tag in replaced:
+    replacement_revs += [SPECIAL_CASED_TAG_REPLACEMENTS[tag],
+                         SPECIAL_CASED_TAG_REPLACEMENTS[tag] + b'^{tree}']
+  replacements = {}
+  if replaced:
+    output = subprocess.check_output(['git', 'rev-parse'] +
+                                     replacement_revs).split()
+    for i, tag in enumerate(replaced):
+      replacements[tag] = output[2*i], output[2*i+1]
+  tag_heads = [replacements.get(tag, (githash, treehash))
+               for tag, githash, treehash in tags]
+
+  # Have cat-file read all the commits convert_tagref will walk up front,
+  # rather than waiting on each one in turn: the tag heads, and the rest of
+  # the tags' first-parent lines down to where they leave the branches (or
+  # have weird parents). Empty tags are just removed, so needn't be read at
+  # all.
+  walked_heads = [head for head, treehash in tag_heads
+                  if treehash != fast_filter_branch.GIT_EMPTY_TREE_HASH]
+  parents = first_parent_parents(walked_heads +
+                                 [b'^' + branch for branch in branches])
+  for rev in walked_heads:
+    while True:
+      fm.prefetch_commit(rev)
+      rev_parents = parents.get(rev)
+      if (rev_parents is None or len(rev_parents) not in (1, 2) or
+          rev_parents[0] in branch_rev_set):
+        break
+      rev = rev_parents[0]
 
-  for tag in tags:
-    convert_tagref(fm, tag, branch_rev_set)
+  for (tag, githash, unused_treehash), (head, treehash) in zip(tags, tag_heads):
+    convert_tagref(fm, tag, githash, head, treehash, branch_rev_set)
 
   fm.close()
 
@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/env python3
 
 # Merges in new entries to the author-ids.conf from the
 # svn-mailer.conf file from the svn host. New entries are copied in,
@@ -6,13 +6,13 @@
 # suffix, which indicates the maximum revision number that data is
 # used for.
 
-import ConfigParser
+import configparser
 import os
 import sys
 import tempfile
 
 def read_authormap(filename):
-  cfg = ConfigParser.RawConfigParser()
+  cfg = configparser.RawConfigParser(strict=False)
   cfg.read(filename)
 
   d = {}
@@ -24,7 +24,7 @@ def read_authormap(filename):
 def update_from_svn_mailer(authorids_filename, svn_mailer_filename, svnrev):
   authormap = read_authormap(authorids_filename)
   updates = read_authormap(svn_mailer_filename)
-  for author, new_email in updates.iteritems():
+  for author, new_email in updates.items():
     assert '@' not in author
 
     old_email = authormap.get(author)
@@ -40,10 +40,10 @@ def update_from_svn_mailer(authorids_filename, svn_mailer_filename, svnrev):
 
 def print_authors(authormap, output_filename):
   with tempfile.NamedTemporaryFile(
-      dir=os.path.dirname(output_filename), delete=False) as fout:
+      'w', dir=os.path.dirname(output_filename), delete=False) as fout:
     fout.write("[authors]\n")
 
-    for author, email in sorted(authormap.iteritems()):
+    for author, email in sorted(authormap.items()):
       fout.write("%s = %s\n" % (author, email))
 
   os.rename(fout.name, output_filename)